@@ -1,24 +1,19 @@
 import streamlit as st
-import numpy as np
-import tempfile
-from scipy.io.wavfile import write
-from transformers import pipeline
-import os
 import io
 
-# Try to import sounddevice, fallback if not available
-try:
-    import sounddevice as sd
-    SOUNDDEVICE_AVAILABLE = True
-except (ImportError, OSError):
-    SOUNDDEVICE_AVAILABLE = False
-
-# Try to import librosa for better audio handling
-try:
-    import librosa
-    LIBROSA_AVAILABLE = True
-except ImportError:
-    LIBROSA_AVAILABLE = False
+from transcribe_utils import (
+    LIBROSA_AVAILABLE,
+    SOUNDDEVICE_AVAILABLE,
+    load_audio,
+    load_audio_ffmpeg,
+    load_audio_librosa,
+    load_transcriber,
+    model_for_language,
+    pcm_to_int16,
+    record_streaming,
+    transcribe,
+    write_wav,
+)
 
 # --- Custom Styles ---
 st.markdown("""
@@ -29,26 +24,14 @@ st.markdown("""
     </style>
     """, unsafe_allow_html=True)
 
-# Initialize Whisper ASR with error handling
-@st.cache_resource
-def load_transcriber():
-    try:
-        st.info("🔄 Loading Whisper model...")
-        transcriber = pipeline("automatic-speech-recognition", model="openai/whisper-small")
-        st.success("✅ Whisper model loaded successfully!")
-        return transcriber
-    except Exception as e:
-        st.error(f"❌ Failed to load Whisper model: {str(e)}")
-        return None
-
-transcriber = load_transcriber()
-
 st.markdown("<h1 style='text-align:center;'>🎤 Voice Recorder & Transcriber</h1>", unsafe_allow_html=True)
 st.markdown("<p style='text-align:center;'>Record your voice and get instant transcription using OpenAI Whisper!</p>", unsafe_allow_html=True)
 st.markdown("---")
 
 language = st.selectbox("Select transcription language", ["auto", "en", "ur", "hi", "fr", "es"])
 
+transcriber = load_transcriber(model_for_language(language))
+
 # Check if transcriber is loaded
 if transcriber is None:
     st.error("❌ Whisper model failed to load. Please refresh the page and try again.")
@@ -63,24 +46,33 @@ if SOUNDDEVICE_AVAILABLE:
     if record_btn:
         st.info("Recording... Speak now!")
         try:
+            # Preview each finished chunk while the rest is still being recorded
+            st.markdown("#### ⏳ Transcribing...")
+            live_transcription = st.empty()
+            parts = []
+
+            def preview_chunk(chunk):
+                text = transcribe(transcriber, chunk, language).strip()
+                if text:
+                    parts.append(text)
+                    live_transcription.markdown(" ".join(parts))
+
             # Record audio: 16 kHz, mono, float32
-            audio = sd.rec(int(duration * 16000), samplerate=16000, channels=1, dtype='float32')
-            sd.wait()
+            audio = record_streaming(duration, preview_chunk)
             st.success("✅ Recording finished!")
 
             # Normalize float32 to int16 PCM for proper WAV
-            audio_int16 = np.int16(audio * 32767)
+            audio_int16 = pcm_to_int16(audio)
 
-            # Save to temp WAV
-            tmp_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-            write(tmp_file.name, 16000, audio_int16)
+            # Encode an in-memory WAV for playback only
+            wav_buffer = io.BytesIO()
+            write_wav(wav_buffer, 16000, audio_int16)
 
-            st.audio(tmp_file.name)  # Play recording
+            st.audio(wav_buffer.getvalue(), format="audio/wav")  # Play recording
 
-            # Transcribe
-            st.markdown("#### ⏳ Transcribing...")
-            kwargs = {} if language == "auto" else {"language": language}
-            transcription = transcriber(tmp_file.name, generate_kwargs=kwargs)["text"]
+            # Chunk cuts can split words, so the final text comes from one pass over the whole recording
+            transcription = transcribe(transcriber, audio.ravel(), language)
+            live_transcription.empty()
             st.markdown("#### 📝 Transcription")
             st.text_area("Transcription:", value=transcription, height=200)
         except Exception as e:
@@ -110,63 +102,55 @@ if uploaded_file is not None:
         st.warning(f"⚠️ File extension '.{file_extension}' might not be supported. Converting to WAV...")
         file_extension = 'wav'
     
-    # Save uploaded file to temporary location with proper extension
-    tmp_file = tempfile.NamedTemporaryFile(suffix=f".{file_extension}", delete=False)
-    tmp_file.write(uploaded_file.getvalue())
-    tmp_file.close()
-    
-    st.info(f"📁 Saved as: {tmp_file.name}")
+    # Keep the upload in memory instead of round-tripping through a temp file
+    audio_bytes = uploaded_file.getvalue()
     
     # Play the uploaded audio
-    st.audio(tmp_file.name)
+    st.audio(audio_bytes, format=uploaded_file.type or f"audio/{file_extension}")
     
     # Transcribe button
     if st.button("🎯 Transcribe Audio"):
         st.markdown("#### ⏳ Transcribing...")
         
         try:
-            # Simple approach - try direct first
-            kwargs = {} if language == "auto" else {"language": language}
-            
             st.info(f"📁 Processing: {uploaded_file.name}")
             st.info(f"🌍 Language: {language}")
             
-            # Always use librosa for better format support
+            # soundfile reads WAV/FLAC natively; compressed formats go straight
+            # through a single ffmpeg pipe, with librosa as the last resort
+            decoders = [
+                ("soundfile", load_audio),
+                ("ffmpeg", lambda data: load_audio_ffmpeg(data, file_extension)),
+            ]
+            if file_extension in ("mp3", "m4a", "ogg", "aac"):
+                decoders.reverse()
             if LIBROSA_AVAILABLE:
+                decoders.append(("librosa", lambda data: load_audio_librosa(data, file_extension)))
+            
+            audio_data = None
+            for decoder_name, decode in decoders:
                 try:
-                    st.info("🔄 Processing with librosa...")
-                    audio_data, sr = librosa.load(tmp_file.name, sr=16000)
-                    st.info(f"📊 Audio loaded: {len(audio_data)} samples at {sr}Hz")
-                    
-                    # Save as WAV for Whisper
-                    wav_file = tempfile.NamedTemporaryFile(suffix=".wav", delete=False)
-                    write(wav_file.name, 16000, (audio_data * 32767).astype(np.int16))
-                    st.info(f"💾 Converted to WAV: {wav_file.name}")
-                    
-                    # Transcribe
-                    transcription = transcriber(wav_file.name, generate_kwargs=kwargs)["text"]
-                    st.success("✅ Transcription completed!")
-                    
-                except Exception as librosa_error:
-                    st.warning(f"⚠️ Librosa failed: {str(librosa_error)}")
-                    
-                    # Fallback to direct approach
-                    try:
-                        st.info("🔄 Trying direct approach...")
-                        transcription = transcriber(tmp_file.name, generate_kwargs=kwargs)["text"]
-                        st.success("✅ Direct transcription completed!")
-                    except Exception as direct_error:
-                        st.error(f"❌ Both approaches failed: {str(direct_error)}")
-                        raise direct_error
+                    st.info(f"🔄 Processing with {decoder_name}...")
+                    audio_data = decode(audio_bytes)
+                    break
+                except Exception as decode_error:
+                    st.warning(f"⚠️ {decoder_name.capitalize()} failed: {str(decode_error)}")
+            
+            if audio_data is not None:
+                st.info(f"📊 Audio loaded: {len(audio_data)} samples at 16000Hz")
+                
+                # Transcribe the decoded samples directly
+                transcription = transcribe(transcriber, audio_data, language)
+                st.success("✅ Transcription completed!")
             else:
-                # Direct approach only
+                # Fallback to direct approach
                 try:
-                    st.info("🔄 Using direct approach...")
-                    transcription = transcriber(tmp_file.name, generate_kwargs=kwargs)["text"]
-                    st.success("✅ Transcription completed!")
-                except Exception as e:
-                    st.error(f"❌ Direct approach failed: {str(e)}")
-                    raise e
+                    st.info("🔄 Trying direct approach...")
+                    transcription = transcribe(transcriber, audio_bytes, language)
+                    st.success("✅ Direct transcription completed!")
+                except Exception as direct_error:
+                    st.error(f"❌ All approaches failed: {str(direct_error)}")
+                    raise direct_error
             
             # Display result
             if transcription and transcription.strip():
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+transcribe_utils = pytest.importorskip("transcribe_utils")
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+
+class FakeMLModel:
+    """Mimics the converted Core ML program by running the original encoder on numpy input."""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.calls = 0
+
+    def predict(self, inputs):
+        self.calls += 1
+        features = torch.from_numpy(inputs["input_features"])
+        with torch.no_grad():
+            hidden = self.encoder(features, return_dict=False)[0]
+        return {"last_hidden_state": hidden.numpy()}
+
+
+def tiny_whisper():
+    torch.manual_seed(0)
+    config = transformers.WhisperConfig(
+        vocab_size=64,
+        num_mel_bins=8,
+        d_model=16,
+        encoder_layers=1,
+        decoder_layers=1,
+        encoder_attention_heads=2,
+        decoder_attention_heads=2,
+        encoder_ffn_dim=32,
+        decoder_ffn_dim=32,
+        max_source_positions=50,
+        max_target_positions=32,
+        decoder_start_token_id=1,
+        pad_token_id=0,
+        eos_token_id=2,
+        bos_token_id=2,
+        begin_suppress_tokens=None,
+        suppress_tokens=None,
+    )
+    return transformers.WhisperForConditionalGeneration(config).eval()
+
+
+def test_generate_runs_through_coreml_encoder():
+    model = tiny_whisper()
+    input_features = torch.randn(2, 8, 100)
+    with torch.no_grad():
+        expected = model.generate(input_features, max_new_tokens=4)
+
+    encoder = model.model.encoder
+    mlmodel = FakeMLModel(encoder)
+    model.model.encoder = transcribe_utils.CoreMLEncoder(mlmodel, encoder, model.dtype)
+    with torch.no_grad():
+        actual = model.generate(input_features, max_new_tokens=4)
+
+    # One predict per item: the Core ML graph only takes a single window
+    assert mlmodel.calls == 2
+    np.testing.assert_array_equal(actual.numpy(), expected.numpy())
@@ -0,0 +1,30 @@
+import io
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+transcribe_utils = pytest.importorskip("transcribe_utils")
+sf = pytest.importorskip("soundfile")
+
+pytestmark = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+
+RECORDING = os.path.join(os.path.dirname(__file__), os.pardir, "temp_Recording.m4a")
+
+
+def test_m4a_with_index_after_audio_is_decoded():
+    # The moov atom of this phone recording comes after mdat, which a pipe can't seek to
+    with open(RECORDING, "rb") as f:
+        audio = transcribe_utils.load_audio_ffmpeg(f.read(), "m4a")
+
+    assert audio.dtype == np.float32
+    assert audio.size > 0
+
+
+def test_empty_output_raises():
+    buf = io.BytesIO()
+    sf.write(buf, np.zeros(0, dtype=np.int16), 16000, format="WAV", subtype="PCM_16")
+
+    with pytest.raises(RuntimeError):
+        transcribe_utils.load_audio_ffmpeg(buf.getvalue(), "wav")
@@ -0,0 +1,73 @@
+import threading
+import time
+import types
+
+import numpy as np
+import pytest
+
+transcribe_utils = pytest.importorskip("transcribe_utils")
+
+
+class FakeInputStream:
+    """Feeds a sample ramp to the callback from a background thread, like PortAudio."""
+
+    def __init__(self, callback, blocksize, stall=False, **kwargs):
+        self.callback = callback
+        self.blocksize = blocksize
+        self.stall = stall
+        self.stopped = threading.Event()
+
+    def _run(self):
+        block = 0
+        while not self.stall and not self.stopped.is_set():
+            start = block * self.blocksize
+            indata = np.arange(start, start + self.blocksize, dtype=np.float32).reshape(-1, 1)
+            try:
+                self.callback(indata, self.blocksize, None, None)
+            except FakeCallbackStop:
+                return
+            block += 1
+            time.sleep(0.001)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self._run)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+
+class FakeCallbackStop(Exception):
+    pass
+
+
+def fake_sounddevice(stall=False):
+    def input_stream(**kwargs):
+        return FakeInputStream(stall=stall, **kwargs)
+
+    return types.SimpleNamespace(InputStream=input_stream, CallbackStop=FakeCallbackStop)
+
+
+def test_record_streaming_previews_full_chunks_and_returns_whole_recording(monkeypatch):
+    monkeypatch.setattr(transcribe_utils, "sd", fake_sounddevice(), raising=False)
+    chunks = []
+
+    audio = transcribe_utils.record_streaming(1.3, lambda chunk: chunks.append(chunk.copy()), chunk_seconds=0.5)
+
+    assert audio.shape == (20800, 1)
+    np.testing.assert_array_equal(audio[:, 0], np.arange(20800, dtype=np.float32))
+    # Two full 0.5s chunks are previewed; the 0.3s tail is left to the final pass
+    assert [len(chunk) for chunk in chunks] == [8000, 8000]
+    np.testing.assert_array_equal(np.concatenate(chunks), audio[:16000, 0])
+
+
+def test_record_streaming_gives_up_when_the_device_stalls(monkeypatch):
+    monkeypatch.setattr(transcribe_utils, "sd", fake_sounddevice(stall=True), raising=False)
+    chunks = []
+
+    audio = transcribe_utils.record_streaming(0.1, chunks.append, chunk_seconds=0.05)
+
+    assert audio.shape == (0, 1)
+    assert chunks == []
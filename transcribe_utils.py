@@ -0,0 +1,496 @@
+import streamlit as st
+import numpy as np
+import soundfile as sf
+from transformers import AutoProcessor, GenerationConfig, pipeline
+from transformers.modeling_outputs import BaseModelOutput
+import torch
+import contextlib
+import os
+import io
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Try to import sounddevice, fallback if not available
+try:
+    import sounddevice as sd
+    SOUNDDEVICE_AVAILABLE = True
+except (ImportError, OSError):
+    SOUNDDEVICE_AVAILABLE = False
+
+# Try to import faster-whisper (CTranslate2) for fast INT8 inference on CPU
+try:
+    from faster_whisper import WhisperModel
+    FASTER_WHISPER_AVAILABLE = True
+except ImportError:
+    FASTER_WHISPER_AVAILABLE = False
+
+# Try to import optimum-intel for OpenVINO INT8 inference on Intel CPUs
+try:
+    from optimum.intel.openvino import OVModelForSpeechSeq2Seq
+    OPENVINO_AVAILABLE = True
+except ImportError:
+    OPENVINO_AVAILABLE = False
+
+# Try to import optimum-onnxruntime for dynamically quantized INT8 ONNX inference
+try:
+    from optimum.onnxruntime import ORTModelForSpeechSeq2Seq, ORTQuantizer
+    from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+# Try to import coremltools to run the encoder on the Apple Neural Engine
+try:
+    import coremltools as ct
+    COREMLTOOLS_AVAILABLE = True
+except ImportError:
+    COREMLTOOLS_AVAILABLE = False
+
+# Try to import the packaged Silero VAD for trimming silence before transcription
+try:
+    from silero_vad import get_speech_timestamps, load_silero_vad
+    SILERO_VAD_AVAILABLE = True
+except ImportError:
+    SILERO_VAD_AVAILABLE = False
+
+# Try to import librosa for better audio handling
+try:
+    import librosa
+    LIBROSA_AVAILABLE = True
+except ImportError:
+    LIBROSA_AVAILABLE = False
+
+# Multilingual model, plus a distilled English-only model with half the decoder
+MULTILINGUAL_MODEL = "openai/whisper-small"
+ENGLISH_MODEL = "distil-whisper/distil-small.en"
+
+# faster-whisper names for the same checkpoints
+FASTER_WHISPER_MODELS = {
+    MULTILINGUAL_MODEL: "small",
+    ENGLISH_MODEL: "distil-small.en",
+}
+
+def model_for_language(language):
+    """Pick the Whisper checkpoint to use for the selected language."""
+    return ENGLISH_MODEL if language == "en" else MULTILINGUAL_MODEL
+
+@st.cache_resource
+def load_generation_config(model_id, language):
+    """Generation config for a checkpoint and language, built once per process."""
+    config = GenerationConfig.from_pretrained(model_id)
+    # Greedy decoding: a single beam keeps decoder cost per token minimal
+    config.num_beams = 1
+    config.do_sample = False
+    # English-only checkpoints reject the language/task tokens
+    if model_id != ENGLISH_MODEL:
+        config.task = "transcribe"
+        if language != "auto":
+            config.language = language
+    return config
+
+# Inference backend: "auto", "faster-whisper", "openvino", "onnx" or "transformers"
+WHISPER_BACKEND = os.environ.get("WHISPER_BACKEND", "auto")
+
+# Converted models are kept here so each export only happens once
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "voice_transcriber")
+OPENVINO_CACHE_DIR = os.path.join(CACHE_DIR, "openvino")
+ONNX_CACHE_DIR = os.path.join(CACHE_DIR, "onnx")
+COREML_CACHE_DIR = os.path.join(CACHE_DIR, "coreml")
+
+def build_cache_dir(cache_dir, build):
+    """Run build(tmp_dir) in a scratch directory, then move the result to cache_dir."""
+    # A failed export leaves nothing at cache_dir, so it is never mistaken for a cache hit
+    parent = os.path.dirname(cache_dir)
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".partial-", dir=parent)
+    try:
+        build(tmp_dir)
+        os.replace(tmp_dir, cache_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Another process may have finished the same export first
+        if not os.path.isdir(cache_dir):
+            raise
+
+# Core ML needs Apple Silicon and coremltools; Intel Macs have no Neural Engine
+COREML_AVAILABLE = COREMLTOOLS_AVAILABLE and sys.platform == "darwin" and platform.machine() == "arm64"
+
+def select_backend():
+    """Pick the inference backend for this host."""
+    if WHISPER_BACKEND != "auto":
+        return WHISPER_BACKEND
+    if torch.cuda.is_available():
+        return "transformers"
+    if COREML_AVAILABLE:
+        # The transformers pipeline with its encoder on the Neural Engine
+        return "transformers"
+    if FASTER_WHISPER_AVAILABLE:
+        return "faster-whisper"
+    if OPENVINO_AVAILABLE:
+        return "openvino"
+    if ONNXRUNTIME_AVAILABLE:
+        return "onnx"
+    return "transformers"
+
+def chunking_kwargs():
+    """Long-form settings: 30s windows with 5s overlap, decoded as a batch."""
+    # Smaller batches on CPU so each batch's activations stay cache-friendly
+    return dict(
+        chunk_length_s=30,
+        stride_length_s=(5, 5),
+        batch_size=8 if torch.cuda.is_available() else 4,
+    )
+
+def load_openvino_pipeline(model_id):
+    """Build an ASR pipeline on an INT8 OpenVINO model, exporting it on first use."""
+    ir_dir = os.path.join(OPENVINO_CACHE_DIR, model_id.replace("/", "--"))
+    if not os.path.isdir(ir_dir):
+        def export(out_dir):
+            OVModelForSpeechSeq2Seq.from_pretrained(model_id, export=True, load_in_8bit=True).save_pretrained(out_dir)
+            AutoProcessor.from_pretrained(model_id).save_pretrained(out_dir)
+        build_cache_dir(ir_dir, export)
+    model = OVModelForSpeechSeq2Seq.from_pretrained(ir_dir)
+    processor = AutoProcessor.from_pretrained(ir_dir)
+    return pipeline(
+        "automatic-speech-recognition",
+        model=model,
+        tokenizer=processor.tokenizer,
+        feature_extractor=processor.feature_extractor,
+        **chunking_kwargs(),
+    )
+
+# ONNX graphs produced by the seq2seq export, each quantized separately
+ONNX_FILES = ("encoder_model", "decoder_model", "decoder_with_past_model")
+
+def load_onnx_pipeline(model_id):
+    """Build an ASR pipeline on a dynamically quantized INT8 ONNX Runtime model, exporting it on first use."""
+    onnx_dir = os.path.join(ONNX_CACHE_DIR, model_id.replace("/", "--"))
+    if not os.path.isdir(onnx_dir):
+        def export(out_dir):
+            with tempfile.TemporaryDirectory() as export_dir:
+                exported = ORTModelForSpeechSeq2Seq.from_pretrained(model_id, export=True)
+                exported.save_pretrained(export_dir)
+                # Dynamic quantization: INT8 weights, activations quantized on the fly
+                qconfig = AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+                for name in ONNX_FILES:
+                    quantizer = ORTQuantizer.from_pretrained(export_dir, file_name=f"{name}.onnx")
+                    quantizer.quantize(save_dir=out_dir, quantization_config=qconfig)
+                exported.config.save_pretrained(out_dir)
+                exported.generation_config.save_pretrained(out_dir)
+                AutoProcessor.from_pretrained(model_id).save_pretrained(out_dir)
+        build_cache_dir(onnx_dir, export)
+    model = ORTModelForSpeechSeq2Seq.from_pretrained(
+        onnx_dir,
+        encoder_file_name="encoder_model_quantized.onnx",
+        decoder_file_name="decoder_model_quantized.onnx",
+        decoder_with_past_file_name="decoder_with_past_model_quantized.onnx",
+        provider="CPUExecutionProvider",
+    )
+    processor = AutoProcessor.from_pretrained(onnx_dir)
+    return pipeline(
+        "automatic-speech-recognition",
+        model=model,
+        tokenizer=processor.tokenizer,
+        feature_extractor=processor.feature_extractor,
+        **chunking_kwargs(),
+    )
+
+def load_pytorch_pipeline(model_id):
+    """Build the transformers ASR pipeline on GPU (FP16) or CPU (FP32)."""
+    # Run on the first GPU in half precision when one is present, otherwise stay on CPU
+    device = 0 if torch.cuda.is_available() else -1
+    dtype = torch.float16 if torch.cuda.is_available() else torch.float32
+    pipeline_kwargs = dict(
+        model=model_id,
+        device=device,
+        torch_dtype=dtype,
+        **chunking_kwargs(),
+    )
+    try:
+        # Fused SDPA (FlashAttention-style) kernels for encoder and decoder attention
+        transcriber = pipeline(
+            "automatic-speech-recognition",
+            model_kwargs={"attn_implementation": "sdpa"},
+            **pipeline_kwargs,
+        )
+    except (TypeError, ValueError, ImportError):
+        # Older transformers/torch without SDPA support: use the default attention
+        transcriber = pipeline("automatic-speech-recognition", **pipeline_kwargs)
+    if torch.cuda.is_available() and hasattr(torch, "compile"):
+        transcriber = compile_encoder(transcriber)
+    elif COREML_AVAILABLE:
+        transcriber = use_coreml_encoder(transcriber, model_id)
+    return transcriber
+
+class CoreMLEncoder(torch.nn.Module):
+    """Stand-in for the Whisper encoder that runs a converted Core ML model."""
+
+    main_input_name = "input_features"
+
+    def __init__(self, mlmodel, encoder, dtype):
+        super().__init__()
+        self.mlmodel = mlmodel
+        # generate() reads conv1/conv2 strides to map frames to encoder positions
+        self.conv1 = encoder.conv1
+        self.conv2 = encoder.conv2
+        self.output_dtype = dtype
+
+    def forward(self, input_features, **kwargs):
+        # The Core ML graph takes a single 30s window, so run the batch item by item
+        hidden = [
+            self.mlmodel.predict({"input_features": features[None].float().cpu().numpy()})["last_hidden_state"]
+            for features in input_features
+        ]
+        last_hidden_state = torch.from_numpy(np.concatenate(hidden)).to(input_features.device, self.output_dtype)
+        return BaseModelOutput(last_hidden_state=last_hidden_state)
+
+class _TraceableEncoder(torch.nn.Module):
+    """Wrap the encoder so tracing sees a plain tensor in and out."""
+
+    def __init__(self, encoder):
+        super().__init__()
+        self.encoder = encoder
+
+    def forward(self, input_features):
+        return self.encoder(input_features, return_dict=False)[0]
+
+@st.cache_resource
+def load_coreml_encoder(model_id, _encoder, num_mel_bins):
+    """Convert the encoder to an FP16 Core ML program for CPU + Neural Engine, cached on disk."""
+    package = os.path.join(COREML_CACHE_DIR, model_id.replace("/", "--") + ".mlpackage")
+    if not os.path.isdir(package):
+        # The feature extractor always pads to 30s, so a fixed input shape covers every call
+        example = torch.zeros(1, num_mel_bins, 3000)
+        with torch.no_grad():
+            traced = torch.jit.trace(_TraceableEncoder(_encoder).eval(), example)
+        mlmodel = ct.convert(
+            traced,
+            inputs=[ct.TensorType(name="input_features", shape=example.shape)],
+            outputs=[ct.TensorType(name="last_hidden_state")],
+            convert_to="mlprogram",
+            compute_units=ct.ComputeUnit.CPU_AND_NE,
+            compute_precision=ct.precision.FLOAT16,
+        )
+        build_cache_dir(package, mlmodel.save)
+    return ct.models.MLModel(package, compute_units=ct.ComputeUnit.CPU_AND_NE)
+
+def use_coreml_encoder(transcriber, model_id):
+    """Swap the encoder for its Core ML conversion, keeping PyTorch if conversion fails."""
+    model = transcriber.model.model
+    try:
+        mlmodel = load_coreml_encoder(model_id, model.encoder, transcriber.model.config.num_mel_bins)
+        model.encoder = CoreMLEncoder(mlmodel, model.encoder, transcriber.model.dtype)
+    except Exception as e:
+        st.warning(f"⚠️ Core ML encoder unavailable, using PyTorch: {str(e)}")
+    return transcriber
+
+def compile_encoder(transcriber):
+    """Compile the Whisper encoder with TorchInductor, keeping eager mode if that fails."""
+    model = transcriber.model.model
+    encoder = model.encoder
+    try:
+        # Frames are always padded to 3000, but the batch size varies: the pipeline
+        # batches chunks and a long upload's last batch is shorter. Default mode, since
+        # reduce-overhead's CUDA graphs are per-thread and Streamlit reruns on new threads.
+        model.encoder = torch.compile(encoder, fullgraph=True)
+        # Compile now to surface failures: batch 1 gets its own graph, and a second batch
+        # size marks the batch dim dynamic so every shorter batch reuses that graph.
+        # warm_up() then warms the full generate path.
+        with torch.inference_mode():
+            for batch_size in sorted({1, chunking_kwargs()["batch_size"]}):
+                features = torch.zeros(
+                    batch_size, transcriber.model.config.num_mel_bins, 3000,
+                    dtype=transcriber.model.dtype, device=transcriber.model.device,
+                )
+                model.encoder(features)
+    except Exception:
+        model.encoder = encoder
+    return transcriber
+
+def warm_up(transcriber):
+    """Run one short forward pass so lazy init and kernel selection happen at load time."""
+    silence = np.zeros(16000, dtype=np.float32)
+    try:
+        if FASTER_WHISPER_AVAILABLE and isinstance(transcriber, WhisperModel):
+            segments, _ = transcriber.transcribe(silence, beam_size=1)
+            list(segments)  # segments are generated lazily
+        else:
+            transcriber({"array": silence, "sampling_rate": 16000}, generate_kwargs={"max_new_tokens": 1})
+    except Exception:
+        # Warm-up is best effort; the first real request just pays the cost instead
+        pass
+
+# Initialize Whisper ASR with error handling.
+# Cached per model so the model is built and warmed once per process rather than on every rerun.
+@st.cache_resource
+def load_transcriber(model_id):
+    try:
+        backend = select_backend()
+        st.info(f"🔄 Loading Whisper model ({model_id}, {backend})...")
+        if backend == "faster-whisper":
+            # CPU-only deployments: CTranslate2 INT8 kernels instead of FP32 PyTorch
+            transcriber = WhisperModel(
+                FASTER_WHISPER_MODELS[model_id],
+                device="cpu",
+                compute_type="int8",
+                cpu_threads=os.cpu_count(),
+            )
+        elif backend == "openvino":
+            transcriber = load_openvino_pipeline(model_id)
+        elif backend == "onnx":
+            transcriber = load_onnx_pipeline(model_id)
+        else:
+            transcriber = load_pytorch_pipeline(model_id)
+        warm_up(transcriber)
+        st.success("✅ Whisper model loaded successfully!")
+        return transcriber
+    except Exception as e:
+        st.error(f"❌ Failed to load Whisper model: {str(e)}")
+        return None
+
+def pcm_to_int16(audio):
+    """Convert float32 samples in [-1, 1] to int16 PCM, saturating out-of-range values."""
+    scratch = np.empty(audio.size, dtype=np.float32)
+    # Scale and clip in place so loud input saturates instead of wrapping around
+    np.multiply(audio.ravel(), 32767.0, out=scratch)
+    np.clip(scratch, -32768.0, 32767.0, out=scratch)
+    return scratch.astype(np.int16)
+
+def write_wav(buf, sr, pcm16):
+    """Write mono int16 PCM to a WAV file object via libsndfile."""
+    sf.write(buf, pcm16, sr, format="WAV", subtype="PCM_16")
+
+def record_streaming(duration, on_chunk, chunk_seconds=5):
+    """Record 16 kHz mono audio, calling on_chunk with each full chunk while recording continues."""
+    total = int(duration * 16000)
+    buf = np.empty((total, 1), dtype=np.float32)
+    filled = 0
+
+    def callback(indata, frames, time_info, status):
+        # Runs on the PortAudio thread; just copy into the preallocated buffer
+        nonlocal filled
+        n = min(frames, total - filled)
+        buf[filled:filled + n] = indata[:n]
+        filled += n
+        if filled >= total:
+            raise sd.CallbackStop
+
+    chunk = int(chunk_seconds * 16000)
+    start = 0
+    # Give up waiting for samples if the device stalls
+    deadline = time.monotonic() + duration + 2.0
+    with sd.InputStream(samplerate=16000, channels=1, dtype="float32", callback=callback, blocksize=1600):
+        # The final chunk is not passed on: the caller transcribes the whole buffer once recording ends
+        while start + chunk < total:
+            end = start + chunk
+            while filled < end and time.monotonic() < deadline:
+                time.sleep(0.05)
+            if filled < end:
+                break
+            on_chunk(buf[start:end, 0])
+            start = end
+        while filled < total and time.monotonic() < deadline:
+            time.sleep(0.05)
+    return buf[:filled]
+
+def load_audio(audio_bytes):
+    """Decode audio bytes to 16 kHz mono float32 with soundfile."""
+    data, sr = sf.read(io.BytesIO(audio_bytes), dtype="float32", always_2d=False)
+    if data.ndim > 1:
+        data = data.mean(axis=1)
+    if sr != 16000:
+        # Only resampling needs scipy, so 16 kHz uploads never import it
+        from scipy.signal import resample_poly
+        # Polyphase resampling is a single filter pass for the common 44.1k/48k rates
+        data = resample_poly(data, 16000, sr).astype(np.float32)
+    return data
+
+# MP4-family files may keep their index after the audio, so ffmpeg needs to seek
+SEEKABLE_INPUT_EXTENSIONS = ("mp4", "m4a", "aac")
+
+def load_audio_ffmpeg(audio_bytes, file_extension):
+    """Decode audio bytes to 16 kHz mono float32 in a single ffmpeg pass."""
+    def run_ffmpeg(source, stdin=None):
+        command = ["ffmpeg", "-v", "error", "-i", source, "-f", "f32le", "-ac", "1", "-ar", "16000", "pipe:1"]
+        return subprocess.run(command, input=stdin, capture_output=True)
+
+    if file_extension in SEEKABLE_INPUT_EXTENSIONS:
+        # A pipe can't be seeked, so give ffmpeg a real file instead
+        with audio_file(audio_bytes, file_extension) as path:
+            result = run_ffmpeg(path)
+    else:
+        result = run_ffmpeg("pipe:0", stdin=audio_bytes)
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(result.stderr.decode(errors="replace").strip() or "ffmpeg produced no audio")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+@contextlib.contextmanager
+def audio_file(audio_bytes, file_extension):
+    """Spill audio bytes to a named temp file for decoders that need a real, seekable path."""
+    tmp_file = tempfile.NamedTemporaryFile(suffix=f".{file_extension}", delete=False)
+    try:
+        with tmp_file:
+            tmp_file.write(audio_bytes)
+        yield tmp_file.name
+    finally:
+        os.remove(tmp_file.name)
+
+def load_audio_librosa(audio_bytes, file_extension):
+    """Decode audio bytes to 16 kHz mono float32 with librosa, for codecs libsndfile can't read."""
+    # librosa only falls back to audioread/ffmpeg for paths, not file objects
+    with audio_file(audio_bytes, file_extension) as path:
+        audio_data, _ = librosa.load(path, sr=16000)
+    return audio_data
+
+# The Silero model keeps recurrent state, so sessions must take turns using it
+VAD_LOCK = threading.Lock()
+
+@st.cache_resource
+def load_vad():
+    """Silero VAD model, loaded once per process; failures raise so they aren't cached."""
+    return load_silero_vad()
+
+def trim_silence(audio):
+    """Keep only the speech regions Silero VAD finds, or return the audio unchanged."""
+    if not SILERO_VAD_AVAILABLE:
+        return audio
+    try:
+        model = load_vad()
+        samples = torch.from_numpy(np.require(audio, np.float32, ["C", "W"]))
+        with VAD_LOCK:
+            timestamps = get_speech_timestamps(samples, model, sampling_rate=16000)
+    except Exception:
+        return audio
+    if not timestamps:
+        return audio
+    return np.concatenate([audio[t["start"]:t["end"]] for t in timestamps])
+
+def transcribe(transcriber, audio, language):
+    """Transcribe encoded audio bytes or a 16 kHz float32 array with whichever backend was loaded."""
+    if FASTER_WHISPER_AVAILABLE and isinstance(transcriber, WhisperModel):
+        if isinstance(audio, bytes):
+            audio = io.BytesIO(audio)
+        # Greedy decoding, and let the VAD skip silent stretches
+        segments, _ = transcriber.transcribe(
+            audio,
+            language=None if language == "auto" else language,
+            beam_size=1,
+            vad_filter=True,
+        )
+        return " ".join(segment.text.strip() for segment in segments)
+    if isinstance(audio, np.ndarray):
+        # Drop silence first: fewer 30s encoder windows and no hallucinated text on gaps
+        audio = trim_silence(audio)
+        # Hand the samples straight to the feature extractor, no decode or resample
+        audio = {"array": audio, "sampling_rate": 16000}
+    # Timestamps are never shown, so skip decoding the timestamp tokens
+    return transcriber(
+        audio,
+        generate_kwargs={"generation_config": load_generation_config(model_for_language(language), language)},
+        return_timestamps=False,
+    )["text"]